@@ -0,0 +1,129 @@
+"""Benchmark the message store against a large chat table.
+
+    python benchmarks/bench_message_store.py --messages 2000000
+    python benchmarks/bench_message_store.py --database-url mysql+pymysql://user:pw@host/db
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cycle_together import db, model, message_store
+
+CHUNK = 10000
+
+
+def make_app(database_url):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    db.init_app(app)
+    return app
+
+
+def seed(messages, trips):
+    user = model.User(email="bench@example.com", name="bench", password="x")
+    db.session.add(user)
+    db.session.flush()
+    for i in range(trips):
+        db.session.add(model.TripProposal(
+            title=f"Trip {i}", description="", departure_location="A", destination="B",
+            distance_km=10, difficulty=model.DifficultyLevel.beginner,
+            start_date_min=datetime.date(2030, 1, 1), start_date_max=datetime.date(2030, 1, 2),
+            duration_days_min=1, duration_days_max=2, budget_per_person=0, max_participants=10,
+            status=model.TripStatus.open, creator_id=user.id
+        ))
+    db.session.commit()
+
+    # Skewed so the first trips hold most of the chat, like popular trips do
+    weights = [1 / (i + 1) for i in range(trips)]
+    trip_ids = list(range(1, trips + 1))
+    start = time.perf_counter()
+    for done in range(0, messages, CHUNK):
+        chosen = random.choices(trip_ids, weights, k=min(CHUNK, messages - done))
+        message_store.append_many([
+            {'trip_id': trip_id, 'author_id': user.id, 'text': 'x' * 80} for trip_id in chosen
+        ])
+    elapsed = time.perf_counter() - start
+    print(f"bulk insert: {messages} messages in {elapsed:.1f}s ({messages / elapsed:,.0f}/s)")
+    return user.id
+
+
+def time_reads(trip_id, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        newest = message_store.page(trip_id)
+    latest = (time.perf_counter() - start) / runs
+    print(f"page latest (trip {trip_id}): {latest * 1000:.2f} ms")
+
+    if not newest:
+        print(f"page older (trip {trip_id}): skipped, trip has no messages")
+        return
+
+    before_id = newest[-1].id
+    start = time.perf_counter()
+    for _ in range(runs):
+        older = message_store.page(trip_id, before_id=before_id)
+        before_id = older[-1].id if older else None
+    paging = (time.perf_counter() - start) / runs
+
+    print(f"page older (trip {trip_id}): {paging * 1000:.2f} ms")
+
+
+def commit_each(trip_id, user_id, text):
+    # The path post_message used before group commit: one transaction per post
+    db.session.add(model.Message(trip_id=trip_id, author_id=user_id, text=text))
+    db.session.commit()
+
+
+def time_burst(app, user_id, threads, per_thread, label, append):
+    def post():
+        with app.app_context():
+            for _ in range(per_thread):
+                append(1, user_id, "burst")
+            db.session.remove()
+
+    workers = [threading.Thread(target=post) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    total = threads * per_thread
+    print(f"{label} burst: {total} posts from {threads} threads in {elapsed:.2f}s ({total / elapsed:,.0f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000000)
+    parser.add_argument("--trips", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        database_url = f"sqlite:///{path}"
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user_id = seed(args.messages, args.trips)
+        time_reads(1, args.runs)
+        time_reads(args.trips, args.runs)
+    time_burst(app, user_id, args.threads, 50, "commit per message", commit_each)
+    time_burst(app, user_id, args.threads, 50, "group commit", message_store.append)
+
+
+if __name__ == "__main__":
+    main()
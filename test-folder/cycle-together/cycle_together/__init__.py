@@ -1,4 +1,5 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
@@ -20,6 +21,18 @@ def create_app():
     app.config['MAIL_PORT'] = 587
     app.config['MAIL_USE_TLS'] = True
     
+    # Number of reverse proxies (e.g. nginx) in front of gunicorn; rate limiting
+    # keys on the client address, so this must match the deployment
+    app.config['PROXY_FIX_X_FOR'] = 0
+    
+    # Seconds between in-process trip expiry runs; None leaves it to `flask expire-trips`.
+    # Every serving process runs its own timer, so with several gunicorn workers
+    # set this for a single process only, or schedule the CLI command from cron.
+    app.config['TRIP_EXPIRY_INTERVAL'] = None
+    
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
     db.init_app(app)
     mail.init_app(app)
     
@@ -33,9 +46,14 @@ def create_app():
     def load_user(user_id):
         return db.session.get(model.User, int(user_id))
     
-    from . import auth, main, trips
+    from . import auth, main, trips, api, ical
     app.register_blueprint(auth.bp)
     app.register_blueprint(main.bp)
     app.register_blueprint(trips.bp)
+    app.register_blueprint(api.bp)
+    app.register_blueprint(ical.bp)
+    
+    from . import scheduler
+    scheduler.init_app(app)
     
     return app
\ No newline at end of file
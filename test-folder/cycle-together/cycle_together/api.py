@@ -0,0 +1,179 @@
+import hashlib
+from flask import Blueprint, request, jsonify, abort, make_response
+import flask_login
+from . import db, model, ratelimit
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+def trip_version(trip_id):
+    # Only the version column and a participation id are read, so unchanged
+    # resources are answered without loading any ORM objects
+    version = db.session.execute(
+        db.select(model.TripProposal.version).where(model.TripProposal.id == trip_id)
+    ).scalar_one_or_none()
+    if version is None:
+        abort(make_response(jsonify({'error': 'Not found'}), 404))
+
+    participation_id = db.session.execute(
+        db.select(model.TripParticipation.id)
+        .where(model.TripParticipation.trip_id == trip_id)
+        .where(model.TripParticipation.user_id == flask_login.current_user.id)
+    ).scalar_one_or_none()
+    if participation_id is None:
+        abort(make_response(jsonify({'error': 'Not authorized'}), 403))
+
+    return version
+
+def changes_since():
+    return request.args.get('changes_since', 0, type=int)
+
+def versioned_response(etag, build):
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    return response
+
+def trip_data(trip):
+    return {
+        'id': trip.id,
+        'version': trip.version,
+        'title': trip.title,
+        'description': trip.description,
+        'image_url': trip.image_url,
+        'departure_location': trip.departure_location,
+        'destination': trip.destination,
+        'route_description': trip.route_description,
+        'distance_km': trip.distance_km,
+        'difficulty': trip.difficulty.name,
+        'start_date_min': trip.start_date_min.isoformat(),
+        'start_date_max': trip.start_date_max.isoformat(),
+        'duration_days_min': trip.duration_days_min,
+        'duration_days_max': trip.duration_days_max,
+        'budget_per_person': trip.budget_per_person,
+        'max_participants': trip.max_participants,
+        'status': trip.status.name,
+        'departure_final': trip.departure_final,
+        'destination_final': trip.destination_final,
+        'dates_final': trip.dates_final,
+        'route_final': trip.route_final,
+        'budget_final': trip.budget_final,
+        'creator_id': trip.creator_id
+    }
+
+@bp.route("/my-trips")
+@ratelimit.limit("poll")
+@flask_login.login_required
+def my_trips():
+    rows = db.session.execute(
+        db.select(
+            model.TripProposal.id,
+            model.TripProposal.version,
+            model.TripProposal.title,
+            model.TripProposal.destination,
+            model.TripProposal.status,
+            model.TripProposal.start_date_min,
+            model.TripProposal.start_date_max
+        )
+        .join(model.TripParticipation)
+        .where(model.TripParticipation.user_id == flask_login.current_user.id)
+        .order_by(model.TripProposal.id)
+    ).all()
+
+    fingerprint = ",".join(f"{row.id}:{row.version}" for row in rows)
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    return versioned_response(etag, lambda: {
+        'trips': [{
+            'id': row.id,
+            'version': row.version,
+            'title': row.title,
+            'destination': row.destination,
+            'status': row.status.name,
+            'start_date_min': row.start_date_min.isoformat(),
+            'start_date_max': row.start_date_max.isoformat()
+        } for row in rows]
+    })
+
+@bp.route("/trips/<int:trip_id>")
+@ratelimit.limit("poll")
+@flask_login.login_required
+def trip(trip_id):
+    version = trip_version(trip_id)
+    since = changes_since()
+
+    def build():
+        if version <= since:
+            return {'version': version, 'changed': False}
+        trip = db.session.get(model.TripProposal, trip_id)
+        return {'version': version, 'changed': True, 'trip': trip_data(trip)}
+
+    return versioned_response(f"trip-{trip_id}-{version}-{since}", build)
+
+@bp.route("/trips/<int:trip_id>/participants")
+@ratelimit.limit("poll")
+@flask_login.login_required
+def participants(trip_id):
+    version = trip_version(trip_id)
+    since = changes_since()
+
+    def build():
+        if version <= since:
+            return {'version': version, 'changed': False}
+        rows = db.session.execute(
+            db.select(
+                model.TripParticipation.user_id,
+                model.TripParticipation.can_edit,
+                model.TripParticipation.joined_at,
+                model.User.name
+            )
+            .join(model.User)
+            .where(model.TripParticipation.trip_id == trip_id)
+            .order_by(model.TripParticipation.id)
+        ).all()
+        # The list is bounded by max_participants, so it is always sent whole
+        return {
+            'version': version,
+            'changed': True,
+            'participants': [{
+                'user_id': row.user_id,
+                'name': row.name,
+                'can_edit': row.can_edit,
+                'joined_at': row.joined_at.isoformat() if row.joined_at else None
+            } for row in rows]
+        }
+
+    return versioned_response(f"participants-{trip_id}-{version}-{since}", build)
+
+@bp.route("/trips/<int:trip_id>/meetups")
+@ratelimit.limit("poll")
+@flask_login.login_required
+def meetups(trip_id):
+    version = trip_version(trip_id)
+    since = changes_since()
+
+    def build():
+        if version <= since:
+            return {'version': version, 'changed': False, 'meetups': []}
+        rows = db.session.execute(
+            db.select(model.Meetup)
+            .where(model.Meetup.trip_id == trip_id)
+            .where(model.Meetup.trip_version > since)
+            .order_by(model.Meetup.meetup_datetime)
+        ).scalars().all()
+        return {
+            'version': version,
+            'changed': True,
+            'meetups': [{
+                'id': meetup.id,
+                'title': meetup.title,
+                'location': meetup.location,
+                'meetup_datetime': meetup.meetup_datetime.isoformat(),
+                'description': meetup.description,
+                'creator_id': meetup.creator_id,
+                'trip_version': meetup.trip_version
+            } for meetup in rows]
+        }
+
+    return versioned_response(f"meetups-{trip_id}-{version}-{since}", build)
@@ -0,0 +1,238 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, request, abort, make_response, url_for
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import db, model
+
+bp = Blueprint("ical", __name__, url_prefix="/calendar")
+
+# Seconds a cached feed is served without checking the database. Local edits
+# drop entries at once; this bounds staleness from edits in other workers.
+DEFAULT_CACHE_TTL = 300
+
+STATUS = {
+    model.TripStatus.open: "TENTATIVE",
+    model.TripStatus.closed_to_new: "TENTATIVE",
+    model.TripStatus.finalized: "CONFIRMED",
+    model.TripStatus.cancelled: "CANCELLED",
+}
+
+
+# render() leaves this in place of every DTSTAMP value so the content can be
+# compared across renders; Feed fills in when that content last changed
+STAMP = "\x00DTSTAMP\x00"
+
+
+class Feed:
+    def __init__(self, content, versions):
+        self.content = content
+        self.versions = versions
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.body = content.replace(STAMP, self.last_modified.strftime('%Y%m%dT%H%M%SZ'))
+        self.etag = hashlib.sha1(self.body.encode()).hexdigest()
+        self.checked = time.monotonic()
+
+
+class FeedCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.feeds = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.feeds.get(key)
+
+    def put(self, key, feed):
+        with self.lock:
+            self.feeds[key] = feed
+
+    def invalidate_trip(self, trip_id):
+        with self.lock:
+            for key in [key for key, feed in self.feeds.items() if trip_id in feed.versions]:
+                del self.feeds[key]
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            self.feeds.pop(("user", user_id), None)
+
+
+cache = FeedCache()
+
+# Invalidation waits for the commit: dropping entries earlier would let a feed
+# request in between re-render and cache the old committed data
+def invalidate_trip(trip_id):
+    db.session.info.setdefault("ical_trips", set()).add(trip_id)
+
+def invalidate_user(user_id):
+    db.session.info.setdefault("ical_users", set()).add(user_id)
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed(session):
+    for trip_id in session.info.pop("ical_trips", ()):
+        cache.invalidate_trip(trip_id)
+    for user_id in session.info.pop("ical_users", ()):
+        cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def discard_rolled_back(session):
+    session.info.pop("ical_trips", None)
+    session.info.pop("ical_users", None)
+
+def serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt="calendar-feed")
+
+@bp.app_template_global()
+def user_feed_url(user_id):
+    return url_for("ical.user_feed", token=serializer().dumps({'user': user_id}), _external=True)
+
+@bp.app_template_global()
+def trip_feed_url(trip_id, user_id):
+    token = serializer().dumps({'trip': trip_id, 'user': user_id})
+    return url_for("ical.trip_feed", trip_id=trip_id, token=token, _external=True)
+
+def load_token(token):
+    try:
+        return serializer().loads(token)
+    except BadSignature:
+        abort(404)
+
+def escape(text):
+    # Browsers submit textareas with CRLF; a bare CR would break the content line
+    text = (text or "").replace("\r\n", "\n").replace("\r", "\n")
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def fold(line):
+    # RFC 5545 lines are at most 75 octets; continuations start with a space
+    data = line.encode()
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    parts.append(data.decode())
+    return "\r\n ".join(parts)
+
+def trip_event(trip):
+    # All-day window from the earliest start to the latest possible return
+    end = trip.start_date_max + timedelta(days=trip.duration_days_max)
+    return [
+        "BEGIN:VEVENT",
+        f"UID:trip-{trip.id}@cycle-together",
+        f"DTSTAMP:{STAMP}",
+        f"DTSTART;VALUE=DATE:{trip.start_date_min.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{end.strftime('%Y%m%d')}",
+        f"SUMMARY:{escape(trip.title)}",
+        f"LOCATION:{escape(trip.departure_location)} to {escape(trip.destination)}",
+        f"DESCRIPTION:{escape(trip.description)}",
+        f"STATUS:{STATUS[trip.status]}",
+        "END:VEVENT",
+    ]
+
+def meetup_event(meetup, trip):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:meetup-{meetup.id}@cycle-together",
+        f"DTSTAMP:{STAMP}",
+        # Meetup times are entered as local wall-clock time, so leave them floating
+        f"DTSTART:{meetup.meetup_datetime.strftime('%Y%m%dT%H%M%S')}",
+        f"SUMMARY:{escape(meetup.title)} ({escape(trip.title)})",
+        f"LOCATION:{escape(meetup.location)}",
+    ]
+    if meetup.description:
+        lines.append(f"DESCRIPTION:{escape(meetup.description)}")
+    if trip.status == model.TripStatus.cancelled:
+        lines.append("STATUS:CANCELLED")
+    lines.append("END:VEVENT")
+    return lines
+
+def render(trip_ids, name):
+    trips = db.session.execute(
+        db.select(model.TripProposal).where(model.TripProposal.id.in_(trip_ids)).order_by(model.TripProposal.id)
+    ).scalars().all()
+    meetups = db.session.execute(
+        db.select(model.Meetup).where(model.Meetup.trip_id.in_(trip_ids)).order_by(model.Meetup.meetup_datetime)
+    ).scalars().all()
+    trips_by_id = {trip.id: trip for trip in trips}
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Cycle Together//Trips//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    for trip in trips:
+        lines.extend(trip_event(trip))
+    for meetup in meetups:
+        lines.extend(meetup_event(meetup, trips_by_id[meetup.trip_id]))
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(fold(line) for line in lines) + "\r\n"
+
+def serve(key, load_versions, name):
+    feed = cache.get(key)
+    ttl = current_app.config.get("ICAL_CACHE_TTL", DEFAULT_CACHE_TTL)
+
+    if feed is None or time.monotonic() - feed.checked > ttl:
+        versions = load_versions()
+        if versions is None:
+            abort(404)
+        if feed is None or feed.versions != versions:
+            content = render(list(versions), name)
+            # Some mutations (joins, permission changes) bump versions without
+            # changing the feed; keep the old ETag and Last-Modified for 304s
+            if feed is None or feed.content != content:
+                feed = Feed(content, versions)
+            feed.versions = versions
+            feed.checked = time.monotonic()
+            cache.put(key, feed)
+        else:
+            feed.checked = time.monotonic()
+
+    response = make_response(feed.body)
+    response.mimetype = "text/calendar"
+    response.set_etag(feed.etag)
+    response.last_modified = feed.last_modified
+    response.cache_control.private = True
+    response.cache_control.max_age = ttl
+    return response.make_conditional(request)
+
+@bp.route("/user/<token>.ics")
+def user_feed(token):
+    user_id = load_token(token).get('user')
+    if user_id is None:
+        abort(404)
+
+    def load_versions():
+        rows = db.session.execute(
+            db.select(model.TripProposal.id, model.TripProposal.version)
+            .join(model.TripParticipation)
+            .where(model.TripParticipation.user_id == user_id)
+        ).all()
+        return {row.id: row.version for row in rows}
+
+    return serve(("user", user_id), load_versions, "Cycle Together")
+
+@bp.route("/trip/<int:trip_id>/<token>.ics")
+def trip_feed(trip_id, token):
+    data = load_token(token)
+    if data.get('trip') != trip_id:
+        abort(404)
+    user_id = data.get('user')
+
+    def load_versions():
+        # Also re-checks that the token's owner is still on the trip
+        row = db.session.execute(
+            db.select(model.TripProposal.version)
+            .join(model.TripParticipation)
+            .where(model.TripProposal.id == trip_id)
+            .where(model.TripParticipation.user_id == user_id)
+        ).first()
+        return {trip_id: row.version} if row else None
+
+    return serve(("trip", trip_id, user_id), load_versions, f"Cycle Together trip {trip_id}")
@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, jsonify
+import os
 import flask_login
-from . import model
+from . import model, ratelimit
 
 bp = Blueprint("main", __name__)
 
@@ -33,4 +34,13 @@ def dashboard():
                          total_distance=total_distance,
                          created_trips=created_trips,
                          difficulty_stats=difficulty_stats,
-                         recent_trips=user_trips[:5])
\ No newline at end of file
+                         recent_trips=user_trips[:5])
+
+# Counts are kept per process, so each gunicorn worker reports only its own
+@bp.route("/metrics")
+def metrics():
+    return jsonify({
+        'scope': 'process',
+        'pid': os.getpid(),
+        'ratelimit_rejections': ratelimit.rejection_counts()
+    })
\ No newline at end of file
@@ -0,0 +1,106 @@
+import threading
+from sqlalchemy.orm import joinedload
+from . import db, model
+
+PAGE_SIZE = 50
+MAX_BATCH = 200
+
+def page(trip_id, before_id=None, after_id=None, limit=PAGE_SIZE):
+    # Newest first, walking one (trip_id, id) index range; ids grow with
+    # insertion order so there is no need to sort on created_at
+    query = (
+        db.select(model.Message)
+        .options(joinedload(model.Message.author))
+        .where(model.Message.trip_id == trip_id)
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(model.Message.id < before_id)
+    if after_id is not None:
+        # Take the oldest new messages first so a poller never skips any
+        query = query.where(model.Message.id > after_id).order_by(model.Message.id)
+        return list(reversed(db.session.execute(query).scalars().all()))
+    query = query.order_by(model.Message.id.desc())
+    return db.session.execute(query).scalars().all()
+
+def append_many(rows):
+    # One multi-row INSERT in a single commit. Messages leave the trip's
+    # version alone; pollers use the message id as their cursor instead.
+    db.session.execute(db.insert(model.Message), rows)
+    db.session.commit()
+
+
+def write_batch(batch):
+    try:
+        append_many([e['row'] for e in batch])
+        return
+    except Exception as e:
+        db.session.rollback()
+        if len(batch) == 1:
+            batch[0]['error'] = e
+            return
+
+    # One bad row (e.g. its trip was just deleted) must not fail everyone
+    # else's message, so retry row by row and keep each error with its caller
+    for entry in batch:
+        try:
+            append_many([entry['row']])
+        except Exception as e:
+            db.session.rollback()
+            entry['error'] = e
+
+
+class GroupCommitter:
+    """Coalesces messages posted concurrently into shared transactions.
+
+    Each caller blocks until its own message is committed. Whichever thread
+    finds no flush in progress writes everything queued so far, so a burst
+    of posts costs one commit instead of one per message.
+
+    Batching needs concurrent request threads in one process (gunicorn
+    --threads or gthread workers); under sync workers each post still gets
+    its own commit.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH):
+        self.max_batch = max_batch
+        self.cond = threading.Condition()
+        self.pending = []
+        self.flushing = False
+
+    def append(self, trip_id, author_id, text):
+        entry = {
+            'row': {'trip_id': trip_id, 'author_id': author_id, 'text': text},
+            'done': False,
+            'error': None
+        }
+        with self.cond:
+            self.pending.append(entry)
+
+        while True:
+            with self.cond:
+                while self.flushing and not entry['done']:
+                    self.cond.wait()
+                if entry['done']:
+                    break
+                self.flushing = True
+                batch = self.pending[:self.max_batch]
+                self.pending = self.pending[self.max_batch:]
+
+            try:
+                write_batch(batch)
+            finally:
+                with self.cond:
+                    for e in batch:
+                        e['done'] = True
+                    self.flushing = False
+                    self.cond.notify_all()
+
+        if entry['error'] is not None:
+            raise entry['error']
+
+
+committer = GroupCommitter()
+
+def append(trip_id, author_id, text):
+    committer.append(trip_id, author_id, text)
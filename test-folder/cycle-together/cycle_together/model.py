@@ -1,7 +1,7 @@
 import datetime
 import enum
 from typing import List, Optional
-from sqlalchemy import String, DateTime, ForeignKey, Integer, Float, Text, Boolean, Date
+from sqlalchemy import String, DateTime, ForeignKey, Integer, Float, Text, Boolean, Date, Index, DDL, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 import flask_login
@@ -67,6 +67,10 @@ class TripProposal(db.Model):
     route_final: Mapped[bool] = mapped_column(Boolean, default=False)
     budget_final: Mapped[bool] = mapped_column(Boolean, default=False)
     
+    # Bumped on every mutation of the trip, its participants or its meetups
+    # (everything the JSON API serves); chat messages don't touch it
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     creator_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
     
@@ -89,8 +93,15 @@ class TripParticipation(db.Model):
     trip: Mapped["TripProposal"] = relationship(back_populates="participations")
 
 
+def _not_mysql(ddl, target, bind, dialect, **kw):
+    return dialect.name != "mysql"
+
+
 class Message(db.Model):
     __tablename__ = 'message'
+    # Every read is one trip's messages in id order. MySQL clusters the table on
+    # (trip_id, id) instead (see below); other backends get a covering index.
+    __table_args__ = (Index('ix_message_trip_id_id', 'trip_id', 'id').ddl_if(callable_=_not_mysql),)
     
     id: Mapped[int] = mapped_column(primary_key=True)
     text: Mapped[str] = mapped_column(Text)
@@ -102,6 +113,20 @@ class Message(db.Model):
     trip: Mapped["TripProposal"] = relationship(back_populates="messages")
 
 
+# InnoDB stores rows in primary key order, so a (trip_id, id) key keeps each
+# trip's chat contiguous and a page is one range read with no row lookups.
+# AUTO_INCREMENT needs id to lead some index, hence the unique key. The ORM
+# keeps id alone as the identity, which stays unique.
+event.listen(
+    Message.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE message ADD UNIQUE KEY uq_message_id (id), "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (trip_id, id)"
+    ).execute_if(dialect="mysql")
+)
+
+
 class Meetup(db.Model):
     __tablename__ = 'meetup'
     
@@ -112,6 +137,7 @@ class Meetup(db.Model):
     description: Mapped[Optional[str]] = mapped_column(Text)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     trip_id: Mapped[int] = mapped_column(ForeignKey("trip_proposal.id"))
+    trip_version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
     creator_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
     
     trip: Mapped["TripProposal"] = relationship(back_populates="meetups")
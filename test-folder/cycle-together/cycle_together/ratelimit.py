@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from flask import current_app, request, session, jsonify, make_response, flash, redirect, url_for
+
+# Policy name -> {key kind: (tokens refilled per second, bucket capacity)}.
+# A trip page polls messages every 3s and participants every 10s, so the user
+# buckets leave room for several open tabs plus API clients. The IP buckets
+# are much looser because many users can share one address.
+POLICIES = {
+    "poll": {
+        "user": (2.0, 60),
+        "ip": (20.0, 300),
+    },
+    "write": {
+        "user": (0.5, 10),
+        "ip": (5.0, 100),
+    },
+}
+
+SHARD_COUNT = 16
+MAX_KEYS_PER_SHARD = 10000
+
+# Per-process counts; each gunicorn worker keeps its own
+rejections = Counter()
+rejections_lock = threading.Lock()
+
+
+class MemoryBackend:
+    """Token buckets kept in this process, sharded so requests rarely share a lock.
+
+    Each shard is a bounded LRU; the least recently used bucket is the one
+    most likely to have refilled, so dropping it rarely changes a decision.
+    """
+
+    def __init__(self, shard_count=SHARD_COUNT, max_keys=MAX_KEYS_PER_SHARD):
+        self.shards = [(OrderedDict(), threading.Lock()) for _ in range(shard_count)]
+        self.max_keys = max_keys
+
+    def consume(self, limits):
+        """Take one token from every (key, rate, capacity) bucket, or from none.
+
+        Returns 0 when allowed, otherwise the seconds until all buckets allow it.
+        """
+        # Lock shards in index order so concurrent callers can't deadlock
+        shard_ids = sorted({hash(key) % len(self.shards) for key, _, _ in limits})
+        locks = [self.shards[i][1] for i in shard_ids]
+        for lock in locks:
+            lock.acquire()
+        try:
+            now = time.monotonic()
+            buckets = []
+            retry_after = 0
+            for key, rate, capacity in limits:
+                shard = self.shards[hash(key) % len(self.shards)][0]
+                bucket = shard.get(key)
+                if bucket is None:
+                    bucket = shard[key] = [capacity, now, rate, capacity]
+                else:
+                    shard.move_to_end(key)
+                tokens = min(bucket[3], bucket[0] + (now - bucket[1]) * bucket[2])
+                bucket[0], bucket[1] = tokens, now
+                if tokens < 1:
+                    retry_after = max(retry_after, (1 - tokens) / bucket[2])
+                buckets.append((shard, bucket))
+
+            if not retry_after:
+                for _, bucket in buckets:
+                    bucket[0] -= 1
+            for shard, _ in buckets:
+                while len(shard) > self.max_keys:
+                    shard.popitem(last=False)
+            return retry_after
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+def get_backend():
+    backend = current_app.extensions.get("ratelimit")
+    if backend is None:
+        backend = current_app.config.get("RATELIMIT_BACKEND") or MemoryBackend()
+        current_app.extensions["ratelimit"] = backend
+    return backend
+
+
+def record_rejection(policy):
+    with rejections_lock:
+        rejections[policy] += 1
+
+
+def rejection_counts():
+    with rejections_lock:
+        return dict(rejections)
+
+
+def limit(policy, redirect_to=None):
+    """Reject with 429 before the view runs once the caller's bucket for policy is empty.
+
+    Must sit above login_required so rejected requests never load the user.
+    Views behind plain HTML forms pass redirect_to, an endpoint to fall back
+    on when there is no referrer, so the user gets a flash message instead
+    of a JSON body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("RATELIMIT_ENABLED", True):
+                return view(*args, **kwargs)
+
+            limits = POLICIES[policy]
+            buckets = [(f"ip:{policy}:{request.remote_addr}", *limits["ip"])]
+            # Read the id flask-login keeps in the session instead of loading the user
+            user_id = session.get("_user_id")
+            if user_id:
+                buckets.append((f"user:{policy}:{user_id}", *limits["user"]))
+
+            retry_after = get_backend().consume(buckets)
+            if retry_after:
+                record_rejection(policy)
+                seconds = math.ceil(retry_after)
+                if redirect_to:
+                    flash(f"Too many requests, please try again in {seconds} seconds")
+                    return redirect(request.referrer or url_for(redirect_to))
+                response = make_response(jsonify({'error': 'Too many requests'}), 429)
+                response.headers["Retry-After"] = str(seconds)
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+import threading
+from datetime import date
+import click
+from flask import current_app
+from . import db, model
+
+DEFAULT_BATCH_SIZE = 500
+
+def expire_trips(today=None, batch_size=DEFAULT_BATCH_SIZE):
+    # Open trips whose latest start date has passed can no longer be joined,
+    # so close them in bounded batches instead of one long table lock.
+    today = today or date.today()
+    changed = []
+
+    while True:
+        # Lock the batch so no editor can change these rows before the UPDATE;
+        # the ids selected are then exactly the ids updated
+        ids = db.session.execute(
+            db.select(model.TripProposal.id)
+            .where(model.TripProposal.status == model.TripStatus.open)
+            .where(model.TripProposal.start_date_max < today)
+            .order_by(model.TripProposal.id)
+            .limit(batch_size)
+            .with_for_update()
+        ).scalars().all()
+        if not ids:
+            db.session.rollback()
+            break
+
+        selected = len(ids)
+        result = db.session.execute(
+            db.update(model.TripProposal)
+            .where(model.TripProposal.id.in_(ids))
+            .where(model.TripProposal.status == model.TripStatus.open)
+            .values(status=model.TripStatus.closed_to_new, version=model.TripProposal.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(ids):
+            # Only possible where FOR UPDATE is ignored (e.g. SQLite); keep
+            # the record exact by re-reading what this transaction changed
+            ids = db.session.execute(
+                db.select(model.TripProposal.id)
+                .where(model.TripProposal.id.in_(ids))
+                .where(model.TripProposal.status == model.TripStatus.closed_to_new)
+            ).scalars().all()
+        db.session.commit()
+        changed.extend(ids)
+
+        if selected < batch_size:
+            break
+
+    if changed:
+        # WARNING so the record survives Flask's default log level outside debug
+        current_app.logger.warning("Closed %d expired trips: %s", len(changed), changed)
+    return changed
+
+def run_periodically(app, interval):
+    def tick():
+        with app.app_context():
+            try:
+                expire_trips(batch_size=app.config.get("TRIP_EXPIRY_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Trip expiry run failed")
+            finally:
+                db.session.remove()
+        schedule()
+
+    def schedule():
+        timer = threading.Timer(interval, tick)
+        timer.daemon = True
+        timer.start()
+
+    schedule()
+
+def init_app(app):
+    @app.cli.command("expire-trips")
+    @click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True, help="Trips updated per transaction.")
+    def expire_trips_command(batch_size):
+        """Close open trips whose start window has passed."""
+        changed = expire_trips(batch_size=batch_size)
+        click.echo(f"Closed {len(changed)} expired trips")
+        for trip_id in changed:
+            click.echo(f"  trip {trip_id}")
+
+    interval = app.config.get("TRIP_EXPIRY_INTERVAL")
+    if not interval:
+        return
+
+    # Start on the first request so CLI commands and the reloader's parent
+    # process, which never serve requests, don't run their own timer
+    started = threading.Event()
+    lock = threading.Lock()
+
+    @app.before_request
+    def start_expiry_timer():
+        if started.is_set():
+            return
+        with lock:
+            if not started.is_set():
+                run_periodically(app, interval)
+                started.set()
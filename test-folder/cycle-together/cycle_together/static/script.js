@@ -72,6 +72,11 @@ document.addEventListener('DOMContentLoaded', function() {
                 if (response.ok) {
                     this.querySelector('textarea').value = '';
                     loadMessages(tripId);
+                } else if (response.status === 429) {
+                    const retryAfter = response.headers.get('Retry-After') || 'a few';
+                    alert('You are posting too fast. Please try again in ' + retryAfter + ' seconds.');
+                } else {
+                    alert('Your message could not be posted. Please try again.');
                 }
             })
             .catch(error => console.error('Error posting message:', error));
@@ -96,9 +101,11 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Auto-refresh participant count every 10 seconds
             setInterval(function() {
+                if (pollingPaused()) return;
                 fetch('/trips/' + tripId + '/participants')
-                    .then(response => response.json())
+                    .then(pollResponse)
                     .then(data => {
+                        if (!data) return;
                         const countElement = document.querySelector('.sidebar-section h3');
                         if (countElement && countElement.textContent.includes('Participants')) {
                             countElement.textContent = 'Participants (' + data.count + '/' + data.max + ')';
@@ -107,6 +114,13 @@ document.addEventListener('DOMContentLoaded', function() {
                     .catch(error => console.error('Error fetching participants:', error));
             }, 10000);
             
+            const olderButton = document.querySelector('.load-older-messages');
+            if (olderButton) {
+                olderButton.addEventListener('click', function() {
+                    loadOlderMessages(tripId, olderButton);
+                });
+            }
+            
             // Auto-refresh messages every 3 seconds (REAL-TIME CHAT!)
             const messagesList = document.querySelector('.messages-list');
             if (messagesList) {
@@ -205,29 +219,131 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Polling stops until this time (ms) after the server answers 429
+let pollPausedUntil = 0;
+
+function pollingPaused() {
+    return Date.now() < pollPausedUntil;
+}
+
+// Returns parsed JSON, or null (leaving the page as it is) on an error response
+function pollResponse(response) {
+    if (response.ok) {
+        return response.json();
+    }
+    if (response.status === 429) {
+        const retryAfter = parseInt(response.headers.get('Retry-After')) || 5;
+        pollPausedUntil = Math.max(pollPausedUntil, Date.now() + retryAfter * 1000);
+    }
+    return null;
+}
+
+// Builds message elements with textContent so user text is never parsed as HTML
+function renderMessages(messages) {
+    const fragment = document.createDocumentFragment();
+    messages.forEach(function(msg) {
+        const item = document.createElement('div');
+        item.className = 'message-item';
+        item.dataset.id = msg.id;
+
+        const header = document.createElement('div');
+        header.className = 'message-header';
+
+        const author = document.createElement('a');
+        author.href = '/user/' + msg.author_id;
+        author.className = 'message-author';
+        author.textContent = msg.author_name;
+
+        const time = document.createElement('span');
+        time.className = 'message-time';
+        time.textContent = msg.timestamp;
+
+        const text = document.createElement('div');
+        text.className = 'message-text';
+        text.textContent = msg.text;
+
+        header.appendChild(author);
+        header.appendChild(time);
+        item.appendChild(header);
+        item.appendChild(text);
+        fragment.appendChild(item);
+    });
+    return fragment;
+}
+
+// Drops messages already on the page, e.g. when two fetches overlap
+function unseenMessages(messagesList, messages) {
+    return messages.filter(function(msg) {
+        return !messagesList.querySelector('.message-item[data-id="' + msg.id + '"]');
+    });
+}
+
 // Function to load messages via AJAX (REAL-TIME CHAT)
+// Only messages newer than the newest one shown are fetched and prepended,
+// so older pages loaded with "Load older messages" stay on the page
+// One fetch at a time; a call made meanwhile (e.g. right after posting)
+// runs once the current fetch finishes, with an up-to-date after_id
+let loadingMessages = false;
+let reloadQueued = false;
+
 function loadMessages(tripId) {
-    fetch('/trips/' + tripId + '/messages')
-        .then(response => response.json())
+    if (loadingMessages) {
+        reloadQueued = true;
+        return;
+    }
+    if (pollingPaused()) return;
+    const messagesList = document.querySelector('.messages-list');
+    if (!messagesList) return;
+    loadingMessages = true;
+
+    let url = '/trips/' + tripId + '/messages';
+    const newest = messagesList.querySelector('.message-item');
+    if (newest) {
+        url += '?after_id=' + newest.dataset.id;
+    }
+
+    fetch(url)
+        .then(pollResponse)
         .then(data => {
-            const messagesList = document.querySelector('.messages-list');
-            if (!messagesList) return;
-            
-            if (data.messages && data.messages.length > 0) {
-                let html = '';
-                data.messages.forEach(function(msg) {
-                    html += '<div class="message-item">';
-                    html += '<div class="message-header">';
-                    html += '<a href="/user/' + msg.author_id + '" class="message-author">' + msg.author_name + '</a>';
-                    html += '<span class="message-time">' + msg.timestamp + '</span>';
-                    html += '</div>';
-                    html += '<div class="message-text">' + msg.text + '</div>';
-                    html += '</div>';
-                });
-                messagesList.innerHTML = html;
-            } else {
-                messagesList.innerHTML = '<p class="empty-messages">No messages yet. Start the conversation!</p>';
+            if (!data || !data.messages) return;
+            const messages = unseenMessages(messagesList, data.messages);
+            if (messages.length === 0) return;
+            const empty = messagesList.querySelector('.empty-messages');
+            if (empty) {
+                empty.remove();
             }
+            messagesList.prepend(renderMessages(messages));
         })
-        .catch(error => console.error('Error loading messages:', error));
+        .catch(error => console.error('Error loading messages:', error))
+        .finally(() => {
+            loadingMessages = false;
+            if (reloadQueued) {
+                reloadQueued = false;
+                loadMessages(tripId);
+            }
+        });
+}
+
+// Function to page back through chat history
+function loadOlderMessages(tripId, button) {
+    if (button.disabled) return;
+    const messagesList = document.querySelector('.messages-list');
+    const items = messagesList.querySelectorAll('.message-item');
+    if (items.length === 0) return;
+
+    button.disabled = true;
+    const oldest = items[items.length - 1];
+    fetch('/trips/' + tripId + '/messages?before_id=' + oldest.dataset.id)
+        .then(pollResponse)
+        .then(data => {
+            if (!data) return;
+            messagesList.append(renderMessages(unseenMessages(messagesList, data.messages)));
+            if (!data.has_more) {
+                button.remove();
+            }
+        })
+        .catch(error => console.error('Error loading older messages:', error))
+        .finally(() => {
+            button.disabled = false;
+        });
 }
\ No newline at end of file
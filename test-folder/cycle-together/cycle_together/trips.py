@@ -3,7 +3,7 @@ import flask_login
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import os
-from . import db, model
+from . import db, model, ratelimit, message_store, ical
 
 bp = Blueprint("trips", __name__, url_prefix="/trips")
 
@@ -23,6 +23,13 @@ def can_edit_trip(trip, user):
     participation = is_participant(trip, user)
     return participation and participation.can_edit
 
+def bump_version(trip):
+    # Increment in SQL so concurrent edits can't hand out the same version
+    trip.version = model.TripProposal.version + 1
+    db.session.flush()
+    ical.invalidate_trip(trip.id)
+    return trip.version
+
 @bp.route("/browse")
 @flask_login.login_required
 def browse():
@@ -128,6 +135,7 @@ def create_post():
             can_edit=True
         )
         db.session.add(participation)
+        ical.invalidate_user(flask_login.current_user.id)
         db.session.commit()
         
         flash("Trip created successfully!")
@@ -150,11 +158,7 @@ def detail(trip_id):
         flash("You must be a participant to view trip details")
         return redirect(url_for("trips.browse"))
     
-    messages = db.session.execute(
-        db.select(model.Message)
-        .where(model.Message.trip_id == trip_id)
-        .order_by(model.Message.created_at.desc())
-    ).scalars().all()
+    messages = message_store.page(trip_id)
     
     meetups = db.session.execute(
         db.select(model.Meetup)
@@ -166,9 +170,11 @@ def detail(trip_id):
                          trip=trip, 
                          participation=participation,
                          messages=messages,
+                         has_older_messages=len(messages) == message_store.PAGE_SIZE,
                          meetups=meetups)
 
 @bp.route("/<int:trip_id>/join", methods=["POST"])
+@ratelimit.limit("write", redirect_to="trips.browse")
 @flask_login.login_required
 def join(trip_id):
     trip = db.session.get(model.TripProposal, trip_id)
@@ -193,6 +199,8 @@ def join(trip_id):
         can_edit=False
     )
     db.session.add(participation)
+    bump_version(trip)
+    ical.invalidate_user(flask_login.current_user.id)
     db.session.commit()
     
     flash("Successfully joined the trip!")
@@ -217,6 +225,7 @@ def leave(trip_id):
             return redirect(url_for("trips.detail", trip_id=trip_id))
     
     db.session.delete(participation)
+    bump_version(trip)
     db.session.commit()
     
     flash("You have left the trip")
@@ -262,6 +271,7 @@ def edit_post(trip_id):
         trip.distance_km = float(request.form.get("distance_km"))
         trip.difficulty = model.DifficultyLevel[request.form.get("difficulty")]
         
+        bump_version(trip)
         db.session.commit()
         flash("Trip updated successfully")
         
@@ -291,6 +301,7 @@ def lock_field(trip_id):
     elif field == "budget":
         trip.budget_final = True
     
+    bump_version(trip)
     db.session.commit()
     flash(f"{field.capitalize()} marked as final")
     return redirect(url_for("trips.detail", trip_id=trip_id))
@@ -303,6 +314,7 @@ def close_trip(trip_id):
         abort(403)
     
     trip.status = model.TripStatus.closed_to_new
+    bump_version(trip)
     db.session.commit()
     
     flash("Trip closed to new participants")
@@ -316,6 +328,7 @@ def finalize(trip_id):
         abort(403)
     
     trip.status = model.TripStatus.finalized
+    bump_version(trip)
     db.session.commit()
     
     flash("Trip finalized!")
@@ -329,12 +342,14 @@ def cancel(trip_id):
         abort(403)
     
     trip.status = model.TripStatus.cancelled
+    bump_version(trip)
     db.session.commit()
     
     flash("Trip cancelled")
     return redirect(url_for("trips.detail", trip_id=trip_id))
 
 @bp.route("/<int:trip_id>/message", methods=["POST"])
+@ratelimit.limit("write")
 @flask_login.login_required
 def post_message(trip_id):
     trip = db.session.get(model.TripProposal, trip_id)
@@ -350,13 +365,7 @@ def post_message(trip_id):
     
     text = request.form.get("text")
     if text:
-        message = model.Message(
-            text=text,
-            author_id=flask_login.current_user.id,
-            trip_id=trip_id
-        )
-        db.session.add(message)
-        db.session.commit()
+        message_store.append(trip_id, flask_login.current_user.id, text)
     
     return redirect(url_for("trips.detail", trip_id=trip_id))
 
@@ -382,6 +391,7 @@ def create_meetup(trip_id):
             meetup_datetime=meetup_datetime,
             description=description,
             trip_id=trip_id,
+            trip_version=bump_version(trip),
             creator_id=flask_login.current_user.id
         )
         db.session.add(meetup)
@@ -423,6 +433,7 @@ def toggle_permissions(trip_id, user_id):
     
     # TOGGLE PERMISSION
     participation.can_edit = not participation.can_edit
+    bump_version(trip)
     db.session.commit()
     
     action = "granted" if participation.can_edit else "revoked"
@@ -430,6 +441,7 @@ def toggle_permissions(trip_id, user_id):
     return redirect(url_for("trips.detail", trip_id=trip_id))
 
 @bp.route("/<int:trip_id>/participants")
+@ratelimit.limit("poll")
 @flask_login.login_required
 def get_participants(trip_id):
     trip = db.session.get(model.TripProposal, trip_id)
@@ -442,6 +454,7 @@ def get_participants(trip_id):
     })
 
 @bp.route("/<int:trip_id>/messages")
+@ratelimit.limit("poll")
 @flask_login.login_required
 def get_messages(trip_id):
     trip = db.session.get(model.TripProposal, trip_id)
@@ -451,11 +464,11 @@ def get_messages(trip_id):
     if not is_participant(trip, flask_login.current_user):
         return jsonify({'error': 'Not authorized'}), 403
     
-    messages = db.session.execute(
-        db.select(model.Message)
-        .where(model.Message.trip_id == trip_id)
-        .order_by(model.Message.created_at.desc())
-    ).scalars().all()
+    messages = message_store.page(
+        trip_id,
+        before_id=request.args.get('before_id', type=int),
+        after_id=request.args.get('after_id', type=int)
+    )
     
     messages_data = []
     for msg in messages:
@@ -467,4 +480,7 @@ def get_messages(trip_id):
             'timestamp': msg.created_at.strftime('%b %d, %Y at %H:%M')
         })
     
-    return jsonify({'messages': messages_data})
\ No newline at end of file
+    return jsonify({
+        'messages': messages_data,
+        'has_more': len(messages) == message_store.PAGE_SIZE
+    })
\ No newline at end of file
@@ -0,0 +1,15 @@
+-- Schema changes for databases created before these columns and indexes
+-- existed. There is no migration tool in this project; run the statements
+-- once, in order, against the MySQL database before deploying the code.
+
+-- Per-trip version used by the JSON API's ETags and changes_since
+ALTER TABLE trip_proposal ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE meetup ADD COLUMN trip_version INTEGER NOT NULL DEFAULT 1;
+
+-- Cluster chat messages by trip: InnoDB stores rows in primary key order, so
+-- each trip's messages become one contiguous range. This rebuilds the table;
+-- on a large message table run it in a maintenance window.
+ALTER TABLE message
+    ADD UNIQUE KEY uq_message_id (id),
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (trip_id, id);